@@ -1,11 +1,15 @@
 import ffmpeg from 'fluent-ffmpeg';
 import { PassThrough } from 'stream';
 import { logger } from '../utils/logger';
+import { getScratchDir } from '../utils/scratch';
 import path from 'path';
 import fs from 'fs/promises';
 
+// Bytes of frame data buffered before waiting for ffmpeg to drain
+const FRAME_STREAM_BUFFER_SIZE = 8 * 1024 * 1024;
+
 export interface TransparentVideoOptions {
-  frames: Buffer[];
+  frames: Iterable<Buffer> | AsyncIterable<Buffer>; // PNG frames, in order
   fps: number;
   outputPath: string;
 }
@@ -15,6 +19,81 @@ export interface CompositeOptions {
   overlayVideo: string;
   outputPath: string;
   format: 'mp4' | 'webm';
+  duration?: number; // Cap output length (e.g. to the source duration)
+}
+
+// NVENC support depends only on the ffmpeg build, so probe it once
+let nvencAvailable: Promise<boolean> | null = null;
+
+function isNvencAvailable(): Promise<boolean> {
+  if (process.env.USE_NVENC !== 'true') {
+    return Promise.resolve(false);
+  }
+
+  if (!nvencAvailable) {
+    nvencAvailable = new Promise((resolve) => {
+      ffmpeg.getAvailableEncoders((err, encoders) => {
+        if (err) {
+          logger.warn('Failed to list ffmpeg encoders, NVENC disabled:', err);
+          resolve(false);
+          return;
+        }
+
+        const available = !!encoders['h264_nvenc'];
+        if (!available) {
+          logger.warn('USE_NVENC is set but ffmpeg has no h264_nvenc encoder');
+        }
+        resolve(available);
+      });
+    });
+  }
+
+  return nvencAvailable;
+}
+
+// Composite output options are fixed per format, so build them once
+const compositeOutputOptions = new Map<string, string[]>();
+
+async function getCompositeOutputOptions(format: 'mp4' | 'webm'): Promise<string[]> {
+  let options = compositeOutputOptions.get(format);
+  if (!options) {
+    options = buildCompositeOutputOptions(format, await isNvencAvailable());
+    compositeOutputOptions.set(format, options);
+  }
+  return options;
+}
+
+function buildCompositeOutputOptions(format: 'mp4' | 'webm', useNvenc: boolean): string[] {
+  if (format === 'webm') {
+    return [
+      '-map', '[overlaid]',
+      '-map', '0:a?',
+      '-c:v', 'libvpx-vp9',
+      '-b:v', '2M',
+      '-c:a', 'libvorbis'
+    ];
+  }
+
+  const outputOptions = [
+    '-map', '[overlaid]',
+    '-map', '0:a?'  // Copy audio from source if exists
+  ];
+
+  // Add GPU encoding if available
+  if (useNvenc) {
+    outputOptions.push('-c:v', 'h264_nvenc');
+    outputOptions.push('-preset', 'p4', '-tune', 'hq', '-rc', 'vbr');
+    outputOptions.push('-b:v', '5M');
+    logger.info('Using NVENC GPU encoding for final output');
+  } else {
+    outputOptions.push('-c:v', 'libx264');
+    outputOptions.push('-preset', 'fast');
+    outputOptions.push('-crf', '23');
+  }
+
+  outputOptions.push('-c:a', 'aac');  // Audio codec
+
+  return outputOptions;
 }
 
 export class FFmpegPipeline {
@@ -27,17 +106,13 @@ export class FFmpegPipeline {
 
   // Get video duration
   async getVideoDuration(videoPath: string): Promise<number> {
-    return new Promise((resolve, reject) => {
-      ffmpeg.ffprobe(videoPath, (err, metadata) => {
-        if (err) {
-          logger.error('Failed to get video duration:', err);
-          reject(err);
-        } else {
-          const duration = metadata.format.duration || 0;
-          resolve(duration);
-        }
-      });
-    });
+    try {
+      const metadata = await this.getVideoMetadata(videoPath);
+      return metadata.format.duration || 0;
+    } catch (err) {
+      logger.error('Failed to get video duration:', err);
+      throw err;
+    }
   }
 
   // Create transparent video from PNG frames
@@ -45,18 +120,8 @@ export class FFmpegPipeline {
     const { frames, fps, outputPath } = options;
 
     return new Promise((resolve, reject) => {
-      // Create a stream from frames
-      const inputStream = new PassThrough();
-
-      // Write frames to stream
-      (async () => {
-        for (const frame of frames) {
-          if (!inputStream.write(frame)) {
-            await new Promise(resolve => inputStream.once('drain', resolve));
-          }
-        }
-        inputStream.end();
-      })();
+      // Create a stream from frames (buffer several PNG frames per drain)
+      const inputStream = new PassThrough({ highWaterMark: FRAME_STREAM_BUFFER_SIZE });
 
       // FFmpeg command
       const command = ffmpeg()
@@ -97,9 +162,37 @@ export class FFmpegPipeline {
         })
         .on('error', (err) => {
           logger.error('FFmpeg error:', err);
+          inputStream.destroy();
           reject(err);
         });
 
+      // Write frames to stream as they become available
+      (async () => {
+        for await (const frame of frames) {
+          if (inputStream.destroyed) {
+            return;
+          }
+          if (!inputStream.write(frame)) {
+            await new Promise<void>(resolve => {
+              const resume = () => {
+                inputStream.off('drain', resume);
+                inputStream.off('close', resume);
+                resolve();
+              };
+              inputStream.on('drain', resume);
+              inputStream.on('close', resume);
+            });
+          }
+        }
+        inputStream.end();
+      })().catch((err) => {
+        // Frame source failed: stop ffmpeg and fail the chunk
+        logger.error('Failed to produce frames:', err);
+        inputStream.destroy(err);
+        command.kill('SIGKILL');
+        reject(err);
+      });
+
       // Run the command
       command.run();
     });
@@ -107,10 +200,17 @@ export class FFmpegPipeline {
 
   // Merge multiple video chunks
   async mergeChunks(chunkPaths: string[], outputPath: string): Promise<void> {
+    // A single chunk is already the merged overlay
+    if (chunkPaths.length === 1) {
+      await fs.rename(chunkPaths[0], outputPath);
+      logger.info(`Chunks merged: ${outputPath}`);
+      return;
+    }
+
     return new Promise(async (resolve, reject) => {
       try {
         // Create concat file
-        const concatFilePath = path.join('/tmp', `concat_${Date.now()}.txt`);
+        const concatFilePath = path.join(getScratchDir(), `concat_${Date.now()}.txt`);
         const concatContent = chunkPaths.map(p => `file '${p}'`).join('\n');
         await fs.writeFile(concatFilePath, concatContent);
 
@@ -147,20 +247,31 @@ export class FFmpegPipeline {
 
   // Composite overlay on source video
   async compositeVideos(options: CompositeOptions): Promise<void> {
-    const { sourceVideo, overlayVideo, outputPath, format } = options;
+    const { sourceVideo, overlayVideo, outputPath, format, duration } = options;
+    const outputOptions = await getCompositeOutputOptions(format);
+    const useNvenc = format === 'mp4' && await isNvencAvailable();
 
     return new Promise((resolve, reject) => {
       const command = ffmpeg()
-        .input(sourceVideo)
-        .input(overlayVideo);
+        .input(sourceVideo);
+
+      // Decode the source on the GPU too when encoding with NVENC
+      // (frames are downloaded for the CPU overlay filter)
+      if (useNvenc) {
+        command.inputOptions(['-hwaccel', 'cuda']);
+      }
+
+      command.input(overlayVideo);
 
       // Build filter complex for overlay
+      // (pass the source through once a shorter overlay ends)
       command.complexFilter([
         {
           filter: 'overlay',
           options: {
             x: 0,
-            y: 0
+            y: 0,
+            eof_action: 'pass'
           },
           inputs: ['0:v', '1:v'],
           outputs: 'overlaid'
@@ -168,35 +279,11 @@ export class FFmpegPipeline {
       ], 'overlaid');
 
       // Output options based on format
-      if (format === 'mp4') {
-        const outputOptions = [
-          '-map', '[overlaid]',
-          '-map', '0:a?',  // Copy audio from source if exists
-          '-preset', 'fast'
-        ];
-
-        // Add GPU encoding if available
-        if (process.env.USE_NVENC === 'true') {
-          outputOptions.push('-c:v', 'h264_nvenc');
-          outputOptions.push('-b:v', '5M');
-          logger.info('Using NVENC GPU encoding for final output');
-        } else {
-          outputOptions.push('-c:v', 'libx264');
-          outputOptions.push('-crf', '23');
-        }
+      command.outputOptions(outputOptions);
 
-        outputOptions.push('-c:a', 'aac');  // Audio codec
-
-        command.outputOptions(outputOptions);
-      } else {
-        // WebM output
-        command.outputOptions([
-          '-map', '[overlaid]',
-          '-map', '0:a?',
-          '-c:v', 'libvpx-vp9',
-          '-b:v', '2M',
-          '-c:a', 'libvorbis'
-        ]);
+      // Overlay may run past the end of the source video
+      if (duration) {
+        command.duration(duration);
       }
 
       command.output(outputPath);
@@ -244,7 +331,7 @@ export class FFmpegPipeline {
   }
 
   // Get video metadata
-  async getVideoMetadata(videoPath: string): Promise<any> {
+  async getVideoMetadata(videoPath: string): Promise<ffmpeg.FfprobeData> {
     return new Promise((resolve, reject) => {
       ffmpeg.ffprobe(videoPath, (err, metadata) => {
         if (err) {
@@ -0,0 +1,101 @@
+import { Job } from 'bullmq';
+import { logger } from '../utils/logger';
+
+// Minimum interval between progress writes (ms)
+const DEFAULT_PROGRESS_INTERVAL = 500;
+
+// Progress jumps at least this large are written without waiting
+const PROGRESS_BYPASS_DELTA = 5;
+
+export class ProgressReporter {
+  private job: Job;
+  private interval: number;
+  private lastReportedAt: number = 0;
+  private lastReported: number = 0;
+  private inFlight: Promise<void> | null = null;
+  private pending: number | null = null;
+  private flushTimer: NodeJS.Timeout | null = null;
+
+  constructor(job: Job, interval: number = DEFAULT_PROGRESS_INTERVAL) {
+    this.job = job;
+    this.interval = interval;
+  }
+
+  // Report progress without blocking the caller (rate-limited)
+  update(progress: number): void {
+    // Coalesce into the next write while one is still in flight
+    if (this.inFlight) {
+      this.pending = progress;
+      return;
+    }
+
+    const now = Date.now();
+    const elapsed = now - this.lastReportedAt;
+    if (elapsed < this.interval && Math.abs(progress - this.lastReported) < PROGRESS_BYPASS_DELTA) {
+      // Keep the latest value and write it when the interval ends
+      this.pending = progress;
+      if (!this.flushTimer) {
+        this.flushTimer = setTimeout(() => this.flush(), this.interval - elapsed);
+      }
+      return;
+    }
+
+    this.clearFlushTimer();
+    this.pending = null;
+    this.write(progress);
+  }
+
+  // Always persist the final progress value
+  async complete(): Promise<void> {
+    this.clearFlushTimer();
+    this.pending = null;
+    if (this.inFlight) {
+      await this.inFlight;
+    }
+    this.lastReportedAt = Date.now();
+    this.lastReported = 100;
+    await this.job.updateProgress(100);
+  }
+
+  // Drop any pending progress write (e.g. once the job has failed)
+  cancel(): void {
+    this.clearFlushTimer();
+    this.pending = null;
+  }
+
+  // Write the value held back by the rate limit
+  private flush(): void {
+    this.flushTimer = null;
+    const next = this.pending;
+    this.pending = null;
+    if (next !== null) {
+      this.update(next);
+    }
+  }
+
+  // Cancel a scheduled trailing write
+  private clearFlushTimer(): void {
+    if (this.flushTimer) {
+      clearTimeout(this.flushTimer);
+      this.flushTimer = null;
+    }
+  }
+
+  // Send one progress write, then flush the latest value queued meanwhile
+  private write(progress: number): void {
+    this.lastReportedAt = Date.now();
+    this.lastReported = progress;
+    this.inFlight = this.job.updateProgress(progress)
+      .catch((error) => {
+        logger.warn(`Failed to update progress for job ${this.job.id}:`, error);
+      })
+      .then(() => {
+        this.inFlight = null;
+        const next = this.pending;
+        this.pending = null;
+        if (next !== null) {
+          this.update(next);
+        }
+      });
+  }
+}
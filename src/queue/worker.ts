@@ -4,6 +4,9 @@ import { OverlayRenderer } from '../renderer/overlay';
 import { FFmpegPipeline } from '../pipeline/ffmpeg';
 import { S3Service } from '../services/s3';
 import { browserManager } from '../renderer/browser';
+import { buildCueIndex, CueIndex, sliceScenario } from '../renderer/scenario';
+import { ProgressReporter } from './progress';
+import { getScratchDir } from '../utils/scratch';
 import path from 'path';
 import fs from 'fs/promises';
 
@@ -26,12 +29,32 @@ interface ChunkInfo {
   endTime: number;
 }
 
+// Shared position in a job's chunk list (chunks from `end` on are skipped)
+interface ChunkCursor {
+  next: number;
+  end: number;
+}
+
 // Initialize browser on startup
 async function initializeBrowser() {
   await browserManager.initialize();
   logger.info('Browser initialized for worker');
 }
 
+// Open render pages ahead of the first job; they wait in the idle page pool
+async function prewarmPages(count: number): Promise<void> {
+  const renderers = Array.from({ length: count }, (_, k) => new OverlayRenderer(`prewarm_${k}`));
+
+  try {
+    await Promise.all(renderers.map(renderer => renderer.initialize()));
+    logger.info(`Prewarmed ${count} render pages`);
+  } catch (error) {
+    logger.warn('Failed to prewarm render pages:', error);
+  }
+
+  await Promise.all(renderers.map(renderer => renderer.cleanup()));
+}
+
 // Divide video into chunks
 function divideIntoChunks(duration: number, chunkSize: number): ChunkInfo[] {
   const chunks: ChunkInfo[] = [];
@@ -51,35 +74,153 @@ function divideIntoChunks(duration: number, chunkSize: number): ChunkInfo[] {
   return chunks;
 }
 
-// Process single chunk
-async function processChunk(
+// Download the source video and probe its duration
+// (on failure or cancellation, no local file is left behind)
+async function downloadSource(
+  s3: S3Service,
+  ffmpeg: FFmpegPipeline,
+  sourceVideoUrl: string,
+  jobId: string,
+  signal: AbortSignal
+): Promise<{ path: string; duration: number }> {
+  const localVideoPath = await s3.downloadVideo(sourceVideoUrl, jobId, signal);
+
+  try {
+    const duration = await ffmpeg.getVideoDuration(localVideoPath);
+    return { path: localVideoPath, duration };
+  } catch (error) {
+    await fs.unlink(localVideoPath).catch(() => {});
+    throw error;
+  }
+}
+
+// Path of a chunk's transparent overlay video
+function getChunkPath(jobId: string, chunkId: number): string {
+  return path.join(getScratchDir(), `${jobId}_chunk_${chunkId}.webm`);
+}
+
+// Wait for every task to settle, then throw the first error (if any)
+async function settleAll(tasks: Promise<unknown>[]): Promise<void> {
+  const results = await Promise.allSettled(tasks);
+  const failure = results.find((result): result is PromiseRejectedResult => result.status === 'rejected');
+  if (failure) {
+    throw failure.reason;
+  }
+}
+
+// Promise that rejects if the given one does, and otherwise never settles
+function rejectOnly(promise: Promise<unknown>): Promise<never> {
+  return promise.then(() => new Promise<never>(() => {}));
+}
+
+// Yield frames from a source and call onDone once it stops (for any
+// reason), with the error if the source failed
+async function* trackCapture(
+  frames: AsyncIterable<Buffer>,
+  onDone: (error?: unknown) => void
+): AsyncGenerator<Buffer> {
+  let failed = false;
+  try {
+    yield* frames;
+  } catch (error) {
+    failed = true;
+    onDone(error);
+    throw error;
+  } finally {
+    if (!failed) {
+      onDone();
+    }
+  }
+}
+
+// Process single chunk. `captured` resolves once the renderer page is free
+// for the next chunk (rejects if capturing failed); `encoded` resolves with
+// the chunk path once encoded.
+function processChunk(
   chunk: ChunkInfo,
   jobData: RenderJobData,
-  renderer: OverlayRenderer
-): Promise<string> {
+  renderer: OverlayRenderer,
+  ffmpeg: FFmpegPipeline,
+  cueIndex: CueIndex | null
+): { captured: Promise<void>; encoded: Promise<string> } {
   logger.info(`Processing chunk ${chunk.id}: ${chunk.startTime}s - ${chunk.endTime}s`);
 
-  // Render frames for this chunk
-  const frames = await renderer.renderChunk({
-    scenario: jobData.scenario,
+  let markCaptured!: (error?: unknown) => void;
+  const captured = new Promise<void>((resolve, reject) => {
+    markCaptured = (error) => (error === undefined ? resolve() : reject(error));
+  });
+
+  // Stream frames for this chunk straight into the encoder
+  // (the page only loads the cues that overlap the chunk)
+  const frames = trackCapture(renderer.streamChunk({
+    scenario: sliceScenario(jobData.scenario, cueIndex, chunk.startTime, chunk.endTime),
     startTime: chunk.startTime,
     endTime: chunk.endTime,
     resolution: jobData.resolution,
     fps: jobData.fps,
-    transparent: true
-  });
+    transparent: true,
+    cueIndex
+  }), markCaptured);
 
   // Create transparent video from frames
-  const ffmpeg = new FFmpegPipeline();
-  const chunkPath = path.join('/tmp', `${jobData.jobId}_chunk_${chunk.id}.webm`);
+  const chunkPath = getChunkPath(jobData.jobId, chunk.id);
 
-  await ffmpeg.createTransparentVideo({
+  const encoded = ffmpeg.createTransparentVideo({
     frames,
     fps: jobData.fps,
     outputPath: chunkPath
-  });
+  }).then(() => chunkPath);
+
+  return { captured, encoded };
+}
 
-  return chunkPath;
+// Render chunks from the shared cursor on one page until none are left.
+// The encoder's tail for one chunk overlaps the capture of the next; at
+// most two of this page's chunks encode at once.
+async function renderPageChunks(
+  renderer: OverlayRenderer,
+  ffmpeg: FFmpegPipeline,
+  chunks: ChunkInfo[],
+  cursor: ChunkCursor,
+  jobData: RenderJobData,
+  cueIndex: CueIndex | null,
+  chunkPaths: string[],
+  onCaptured: () => void
+): Promise<void> {
+  const encodes: Promise<void>[] = [];
+
+  try {
+    while (cursor.next < cursor.end) {
+      const chunk = chunks[cursor.next++];
+
+      if (encodes.length >= 2) {
+        await encodes[encodes.length - 2];
+      }
+
+      const { captured, encoded } = processChunk(chunk, jobData, renderer, ffmpeg, cueIndex);
+      const stored = encoded.then((chunkPath) => {
+        chunkPaths[chunk.id] = chunkPath;
+      });
+      stored.catch(() => {
+        // Awaited (and rethrown) below; avoids an unhandled rejection meanwhile
+      });
+      encodes.push(stored);
+
+      // Stop as soon as the capture or any of this page's pending encodes
+      // fails (only the last two can still be running)
+      await Promise.race([captured, ...encodes.slice(-2).map(rejectOnly)]);
+      onCaptured();
+    }
+
+    await Promise.all(encodes);
+
+  } catch (error) {
+    // Stop the other pages from taking more chunks, and let this page's
+    // encoders finish before the job cleans up their files
+    cursor.next = cursor.end;
+    await Promise.allSettled(encodes);
+    throw error;
+  }
 }
 
 // Main worker function
@@ -87,6 +228,16 @@ export async function startWorker() {
   // Initialize browser
   await initializeBrowser();
 
+  // Services are stateless, so jobs share them (and the S3 connection pool)
+  const s3 = new S3Service();
+  const ffmpeg = new FFmpegPipeline();
+
+  // Browser pages rendering a job's chunks in parallel
+  const renderConcurrency = Math.max(1, parseInt(process.env.RENDER_CONCURRENCY || '2'));
+
+  // Warm up one job's worth of pages in the background
+  prewarmPages(renderConcurrency);
+
   const worker = new Worker<RenderJobData>(
     'render',
     async (job: Job<RenderJobData>) => {
@@ -95,97 +246,155 @@ export async function startWorker() {
 
       logger.info(`Starting render job ${jobId}`);
 
+      const progress = new ProgressReporter(job);
+
+      // Everything the job may leave behind, cleaned up however it ends
+      const renderers: OverlayRenderer[] = [];
+      const tempFiles: string[] = [];
+      let sourcePromise: Promise<{ path: string; duration: number }> | null = null;
+      const download = new AbortController();
+      let chunks: ChunkInfo[] = [];
+      let finalUrl: string;
+
       try {
-        // Initialize services
-        const s3 = new S3Service();
-        const ffmpeg = new FFmpegPipeline();
+        // Initialize renderer for this job
         const renderer = new OverlayRenderer(jobId);
+        renderers.push(renderer);
 
         // Update job progress
-        await job.updateProgress(5);
+        progress.update(5);
+
+        // Start downloading the source video while the overlay renders
+        logger.info('Downloading source video from S3...');
+        sourcePromise = downloadSource(s3, ffmpeg, sourceVideoUrl, jobId, download.signal);
+        sourcePromise.catch(() => {
+          // Awaited (and rethrown) below; avoids an unhandled rejection meanwhile
+        });
 
         // Initialize renderer
         await renderer.initialize();
-        await job.updateProgress(10);
-
-        // Download source video from S3
-        logger.info('Downloading source video from S3...');
-        const localVideoPath = await s3.downloadVideo(sourceVideoUrl, jobId);
-        await job.updateProgress(20);
+        progress.update(10);
 
-        // Get video duration
-        const videoDuration = await ffmpeg.getVideoDuration(localVideoPath);
-        logger.info(`Video duration: ${videoDuration}s`);
+        // Index cue timings once and only render up to the last cue.
+        // Without cue timings the overlay must cover the whole video.
+        const cueIndex = buildCueIndex(job.data.scenario);
+        const renderDuration = cueIndex?.duration || (await sourcePromise).duration;
+        logger.info(`Overlay render duration: ${renderDuration}s`);
 
         // Divide into chunks
-        const chunks = divideIntoChunks(videoDuration, chunkSize);
+        chunks = divideIntoChunks(renderDuration, chunkSize);
         logger.info(`Divided into ${chunks.length} chunks`);
 
-        // Process each chunk
-        const chunkPaths: string[] = [];
-        const chunkProgressStep = 50 / chunks.length;
+        // Render on several pages at once; each chunk goes to the next free page
+        for (let k = 1; k < Math.min(renderConcurrency, chunks.length); k++) {
+          renderers.push(new OverlayRenderer(`${jobId}_${k}`));
+        }
+        await settleAll(renderers.slice(1).map(pageRenderer => pageRenderer.initialize()));
 
-        for (let i = 0; i < chunks.length; i++) {
-          const chunk = chunks[i];
-          const chunkPath = await processChunk(chunk, job.data, renderer);
-          chunkPaths.push(chunkPath);
+        const chunkPaths: string[] = new Array(chunks.length);
+        const cursor: ChunkCursor = { next: 0, end: chunks.length };
+        let capturedChunks = 0;
 
-          // Update progress
-          await job.updateProgress(20 + (i + 1) * chunkProgressStep);
-        }
+        // Cues may run past the video; once its duration is known, skip the
+        // chunks after its end and cut the last one short
+        sourcePromise.then((source) => {
+          if (!source.duration) {
+            return; // Unknown duration (probe failed to report one)
+          }
+          const end = chunks.findIndex(chunk => chunk.startTime >= source.duration);
+          if (end !== -1 && end < cursor.end) {
+            cursor.end = end;
+            logger.info(`Rendering ${end} of ${chunks.length} chunks (video ends at ${source.duration}s)`);
+          }
+          const last = chunks[cursor.end - 1];
+          if (last && last.endTime > source.duration) {
+            last.endTime = source.duration;
+          }
+        }, () => {
+          // Awaited (and rethrown) below
+        });
+
+        // Let every page finish (or fail) before cleaning up
+        await settleAll(renderers.map(pageRenderer => renderPageChunks(
+          pageRenderer,
+          ffmpeg,
+          chunks,
+          cursor,
+          job.data,
+          cueIndex,
+          chunkPaths,
+          () => {
+            // Update progress
+            capturedChunks++;
+            progress.update(20 + Math.min(capturedChunks, cursor.end) * 50 / cursor.end);
+          }
+        )));
+
+        // Wait for the source video
+        const source = await sourcePromise;
+        logger.info(`Video duration: ${source.duration}s`);
 
         // Merge all transparent chunks
         logger.info('Merging transparent chunks...');
-        const mergedOverlayPath = path.join('/tmp', `${jobId}_overlay.webm`);
-        await ffmpeg.mergeChunks(chunkPaths, mergedOverlayPath);
-        await job.updateProgress(75);
+        const mergedOverlayPath = path.join(getScratchDir(), `${jobId}_overlay.webm`);
+        tempFiles.push(mergedOverlayPath);
+        // (chunks taken before the cut past the video's end are dropped)
+        await ffmpeg.mergeChunks(chunkPaths.slice(0, cursor.end), mergedOverlayPath);
+        progress.update(75);
 
         // Composite with original video
         logger.info('Compositing with original video...');
         const outputPath = path.join('/tmp', `${jobId}_final.${format}`);
+        tempFiles.push(outputPath);
         await ffmpeg.compositeVideos({
-          sourceVideo: localVideoPath,
+          sourceVideo: source.path,
           overlayVideo: mergedOverlayPath,
           outputPath,
-          format
+          format,
+          duration: source.duration
         });
-        await job.updateProgress(90);
+        progress.update(90);
 
         // Upload to S3
         logger.info('Uploading final video to S3...');
-        const finalUrl = await s3.uploadVideo(outputPath, jobId);
-        await job.updateProgress(95);
+        finalUrl = await s3.uploadVideo(outputPath, jobId);
+        progress.update(95);
+
+      } catch (error) {
+        // Don't keep downloading a source the failed job no longer needs
+        download.abort();
+        progress.cancel();
+        logger.error(`Job ${jobId} failed:`, error);
+        throw error;
 
+      } finally {
         // Cleanup
-        await renderer.cleanup();
-
-        // Clean up temporary files
-        const tempFiles = [localVideoPath, mergedOverlayPath, outputPath, ...chunkPaths];
-        for (const file of tempFiles) {
-          try {
-            await fs.unlink(file);
-          } catch (err) {
-            // Ignore cleanup errors
-          }
+        await Promise.all(renderers.map(pageRenderer => pageRenderer.cleanup()));
+
+        // Wait for the (possibly cancelled) download to stop; an unfinished
+        // download removes its own file
+        const source = await sourcePromise?.catch(() => null);
+        if (source) {
+          tempFiles.push(source.path);
         }
+        tempFiles.push(...chunks.map(chunk => getChunkPath(jobId, chunk.id)));
 
-        await job.updateProgress(100);
+        // Clean up temporary files (in parallel, ignoring errors)
+        await Promise.allSettled(tempFiles.map(file => fs.unlink(file)));
+      }
 
-        const processingTime = (Date.now() - startTime) / 1000;
-        logger.info(`Job ${jobId} completed in ${processingTime}s`);
+      await progress.complete();
 
-        return {
-          success: true,
-          jobId,
-          finalUrl,
-          processingTime,
-          chunks: chunks.length
-        };
+      const processingTime = (Date.now() - startTime) / 1000;
+      logger.info(`Job ${jobId} completed in ${processingTime}s`);
 
-      } catch (error) {
-        logger.error(`Job ${jobId} failed:`, error);
-        throw error;
-      }
+      return {
+        success: true,
+        jobId,
+        finalUrl,
+        processingTime,
+        chunks: chunks.length
+      };
     },
     {
       connection: {
@@ -215,19 +424,15 @@ export async function startWorker() {
   });
 
   // Graceful shutdown
-  process.on('SIGTERM', async () => {
-    logger.info('SIGTERM received, shutting down worker...');
+  const shutdown = async (signal: NodeJS.Signals) => {
+    logger.info(`${signal} received, shutting down worker...`);
     await worker.close();
     await browserManager.shutdown();
     process.exit(0);
-  });
+  };
 
-  process.on('SIGINT', async () => {
-    logger.info('SIGINT received, shutting down worker...');
-    await worker.close();
-    await browserManager.shutdown();
-    process.exit(0);
-  });
+  process.on('SIGTERM', shutdown);
+  process.on('SIGINT', shutdown);
 
   logger.info('Worker started and listening for jobs');
 
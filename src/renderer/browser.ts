@@ -4,16 +4,30 @@ import { logger } from '../utils/logger';
 export class BrowserManager {
   private browser: Browser | null = null;
   private pages: Map<string, Page> = new Map();
+  private idlePages: Page[] = [];
+
+  private launching: Promise<Browser> | null = null;
 
   async initialize(): Promise<void> {
     if (this.browser) {
       return;
     }
 
+    // Share one launch between concurrent callers
+    if (!this.launching) {
+      this.launching = this.launch().finally(() => {
+        this.launching = null;
+      });
+    }
+
+    await this.launching;
+  }
+
+  private async launch(): Promise<Browser> {
     try {
       logger.info('Initializing Puppeteer browser...');
 
-      this.browser = await puppeteer.launch({
+      const browser = await puppeteer.launch({
         headless: true,
         args: [
           '--no-sandbox',
@@ -27,7 +41,19 @@ export class BrowserManager {
         ]
       });
 
+      // Relaunch on next use if the browser crashes
+      browser.on('disconnected', () => {
+        if (this.browser === browser) {
+          logger.warn('Browser disconnected');
+          this.browser = null;
+          this.pages.clear();
+          this.idlePages = [];
+        }
+      });
+
+      this.browser = browser;
       logger.info('Browser initialized successfully');
+      return browser;
     } catch (error) {
       logger.error('Failed to initialize browser:', error);
       throw error;
@@ -61,6 +87,32 @@ export class BrowserManager {
     }
   }
 
+  // Take a page released by an earlier job, if one is still open
+  acquireIdlePage(pageId: string): Page | null {
+    let page = this.idlePages.pop();
+    while (page && page.isClosed()) {
+      page = this.idlePages.pop();
+    }
+
+    if (!page) {
+      return null;
+    }
+
+    this.pages.set(pageId, page);
+    logger.debug(`Reusing idle page for ID: ${pageId}`);
+    return page;
+  }
+
+  // Keep a page open for reuse by a later job
+  releasePage(pageId: string): void {
+    const page = this.pages.get(pageId);
+    if (page) {
+      this.pages.delete(pageId);
+      this.idlePages.push(page);
+      logger.debug(`Released page with ID: ${pageId}`);
+    }
+  }
+
   async closePage(pageId: string): Promise<void> {
     const page = this.pages.get(pageId);
     if (page) {
@@ -76,16 +128,17 @@ export class BrowserManager {
 
   async shutdown(): Promise<void> {
     try {
-      // Close all pages
-      for (const [, page] of this.pages) {
-        await page.close();
-      }
+      // Close all pages at once (one failing close doesn't stop the others)
+      const pages = [...this.pages.values(), ...this.idlePages];
+      await Promise.allSettled(pages.map(page => page.close()));
       this.pages.clear();
+      this.idlePages = [];
 
       // Close browser
       if (this.browser) {
-        await this.browser.close();
+        const browser = this.browser;
         this.browser = null;
+        await browser.close();
       }
 
       logger.info('Browser shut down successfully');
@@ -1,6 +1,7 @@
-import { Page } from 'puppeteer';
+import { CDPSession, Page } from 'puppeteer';
 import { browserManager } from './browser';
 import { logger } from '../utils/logger';
+import { CueIndex, hasActiveCue } from './scenario';
 import '../types/global';
 
 export interface RenderOptions {
@@ -13,6 +14,7 @@ export interface RenderOptions {
   };
   fps: number;
   transparent?: boolean;
+  cueIndex?: CueIndex | null;
 }
 
 export interface FrameData {
@@ -23,6 +25,8 @@ export interface FrameData {
 
 export class OverlayRenderer {
   private page: Page | null = null;
+  private cdp: CDPSession | null = null;
+  private transparentBackground = false;
   private pageId: string;
 
   constructor(pageId: string) {
@@ -31,26 +35,12 @@ export class OverlayRenderer {
 
   async initialize(): Promise<void> {
     try {
-      // Create browser page
-      this.page = await browserManager.createPage(this.pageId);
-
-      // Set viewport to match resolution
-      await this.page.setViewport({
-        width: 1920,
-        height: 1080,
-        deviceScaleFactor: 1
-      });
-
-      // Navigate to overlay render page
-      const renderPageUrl = `http://localhost:${process.env.PORT || 3000}/static/overlay-render.html`;
-      await this.page.goto(renderPageUrl, {
-        waitUntil: 'networkidle0'
-      });
+      // Reuse a page an earlier job left on the render page, if any
+      this.page = browserManager.acquireIdlePage(this.pageId) || await this.openRenderPage();
 
-      // Wait for page to be ready
-      await this.page.waitForFunction('() => window.pageReady === true', {
-        timeout: 10000
-      });
+      // Dedicated CDP session for frame capture
+      this.cdp = await this.page.createCDPSession();
+      this.transparentBackground = false;
 
       logger.info(`Overlay renderer initialized for page ${this.pageId}`);
 
@@ -60,6 +50,56 @@ export class OverlayRenderer {
     }
   }
 
+  // Create a browser page and load the overlay render page into it
+  private async openRenderPage(): Promise<Page> {
+    const page = await browserManager.createPage(this.pageId);
+
+    try {
+      await this.loadRenderPage(page);
+    } catch (error) {
+      // Never leave a half-loaded page around for reuse
+      await browserManager.closePage(this.pageId);
+      throw error;
+    }
+
+    return page;
+  }
+
+  // Navigate a page to the overlay render page and wait until it can render
+  private async loadRenderPage(page: Page): Promise<void> {
+    // (createPage already set the default 1920x1080 viewport)
+
+    // Navigate to overlay render page
+    const renderPageUrl = `http://localhost:${process.env.PORT || 3000}/static/overlay-render.html`;
+    // (pageReady is set on DOMContentLoaded, so don't wait for network idle)
+    await page.goto(renderPageUrl, {
+      waitUntil: 'domcontentloaded'
+    });
+
+    // Wait for page to be ready
+    await page.waitForFunction('() => window.pageReady === true', {
+      timeout: 10000
+    });
+
+    // Load the caption font up front; web fonts are otherwise only fetched
+    // once text using them is laid out, i.e. during the first frames
+    const fontsLoaded = await page.evaluate(async () => {
+      try {
+        const faces = await Promise.all([
+          document.fonts.load('400 16px "Noto Sans KR"'),
+          document.fonts.load('700 16px "Noto Sans KR"')
+        ]);
+        return faces.every(loaded => loaded.length > 0);
+      } catch (error) {
+        return false;
+      }
+    });
+
+    if (!fontsLoaded) {
+      logger.warn('Failed to load the Noto Sans KR font; captions fall back to system fonts');
+    }
+  }
+
   async loadScenario(scenario: any): Promise<void> {
     if (!this.page) {
       throw new Error('Renderer not initialized');
@@ -83,12 +123,59 @@ export class OverlayRenderer {
   }
 
   async renderFrames(options: RenderOptions): Promise<FrameData[]> {
-    if (!this.page) {
+    const { startTime, fps } = options;
+    const frames: FrameData[] = [];
+
+    let frameNumber = 0;
+    for await (const data of this.captureFrames(options)) {
+      frames.push({
+        frameNumber,
+        timestamp: startTime + (frameNumber / fps),
+        data
+      });
+      frameNumber++;
+    }
+
+    return frames;
+  }
+
+  async renderChunk(options: RenderOptions): Promise<Buffer[]> {
+    const frames: Buffer[] = [];
+    for await (const data of this.captureFrames(options)) {
+      frames.push(data);
+    }
+    return frames;
+  }
+
+  // Yield frames as they are captured, so a consumer can encode them
+  // without holding the whole chunk in memory
+  streamChunk(options: RenderOptions): AsyncGenerator<Buffer> {
+    return this.captureFrames(options);
+  }
+
+  // Make the page background transparent (or restore it) if it changed
+  private async setTransparentBackground(transparent: boolean): Promise<void> {
+    if (transparent === this.transparentBackground) {
+      return;
+    }
+
+    if (transparent) {
+      await this.cdp!.send('Emulation.setDefaultBackgroundColorOverride', {
+        color: { r: 0, g: 0, b: 0, a: 0 }
+      });
+    } else {
+      await this.cdp!.send('Emulation.setDefaultBackgroundColorOverride');
+    }
+    this.transparentBackground = transparent;
+  }
+
+  // Capture each frame in order (next frame is captured when requested)
+  private async *captureFrames(options: RenderOptions): AsyncGenerator<Buffer> {
+    if (!this.page || !this.cdp) {
       throw new Error('Renderer not initialized');
     }
 
-    const frames: FrameData[] = [];
-    const { startTime, endTime, fps, resolution } = options;
+    const { startTime, endTime, fps, resolution, cueIndex } = options;
     const duration = endTime - startTime;
     const totalFrames = Math.ceil(duration * fps);
 
@@ -98,39 +185,59 @@ export class OverlayRenderer {
       // Load scenario
       await this.loadScenario(options.scenario);
 
-      // Set viewport to match resolution
-      await this.page.setViewport({
-        width: resolution.width,
-        height: resolution.height,
-        deviceScaleFactor: 1
-      });
+      // Set viewport to match resolution (unless it already does;
+      // every setViewport call re-applies device metrics emulation)
+      const viewport = this.page.viewport();
+      if (!viewport ||
+          viewport.width !== resolution.width ||
+          viewport.height !== resolution.height ||
+          viewport.deviceScaleFactor !== 1) {
+        await this.page.setViewport({
+          width: resolution.width,
+          height: resolution.height,
+          deviceScaleFactor: 1
+        });
+      }
+
+      // Set the background once per chunk rather than around every capture
+      await this.setTransparentBackground(options.transparent !== false); // Default to transparent
+
+      // Frame captured while no cue was visible, reused for later empty frames
+      let blankFrame: Buffer | null = null;
 
       // Render each frame
       for (let i = 0; i < totalFrames; i++) {
         const currentTime = startTime + (i / fps);
+        // Frames outside every cue window are only candidates; the page
+        // confirms after the seek that nothing was drawn
+        const maybeBlank = cueIndex ? !hasActiveCue(cueIndex, currentTime) : false;
 
         // Seek to current time
-        await this.page.evaluate(async (time: number) => {
+        const seek = await this.page.evaluate(async (time: number) => {
           return await window.seekToTime!(time);
         }, currentTime);
+        const isBlank = maybeBlank && seek.blank === true;
 
-        // Capture frame
-        const screenshot = await this.page.screenshot({
-          type: 'png',
-          omitBackground: options.transparent !== false, // Default to transparent
-          clip: {
-            x: 0,
-            y: 0,
-            width: resolution.width,
-            height: resolution.height
-          }
-        });
+        if (isBlank && blankFrame) {
+          yield blankFrame;
+          continue;
+        }
 
-        frames.push({
-          frameNumber: i,
-          timestamp: currentTime,
-          data: screenshot as Buffer
+        // Capture the viewport (one CDP call; no clip, which would make
+        // Chromium capture beyond the viewport)
+        const { data } = await this.cdp.send('Page.captureScreenshot', {
+          format: 'png',
+          optimizeForSpeed: true, // Fast PNG compression (ffmpeg decodes it right away)
+          fromSurface: true,
+          captureBeyondViewport: false
         });
+        const screenshot = Buffer.from(data, 'base64');
+
+        if (isBlank) {
+          blankFrame = screenshot;
+        }
+
+        yield screenshot;
 
         // Progress logging
         if (i % 30 === 0) { // Log every second (at 30fps)
@@ -138,8 +245,7 @@ export class OverlayRenderer {
         }
       }
 
-      logger.info(`Successfully rendered ${frames.length} frames`);
-      return frames;
+      logger.info(`Successfully rendered ${totalFrames} frames`);
 
     } catch (error) {
       logger.error('Failed to render frames:', error);
@@ -147,11 +253,6 @@ export class OverlayRenderer {
     }
   }
 
-  async renderChunk(options: RenderOptions): Promise<Buffer[]> {
-    const frameData = await this.renderFrames(options);
-    return frameData.map(f => f.data);
-  }
-
   async cleanup(): Promise<void> {
     try {
       if (this.page) {
@@ -160,13 +261,22 @@ export class OverlayRenderer {
         });
       }
 
-      await browserManager.closePage(this.pageId);
-      this.page = null;
+      if (this.cdp) {
+        await this.setTransparentBackground(false);
+        await this.cdp.detach();
+      }
+
+      // Keep the page (still on the render page) for the next job
+      browserManager.releasePage(this.pageId);
 
       logger.debug(`Cleaned up renderer for page ${this.pageId}`);
 
     } catch (error) {
       logger.error('Failed to cleanup renderer:', error);
+      await browserManager.closePage(this.pageId);
+    } finally {
+      this.page = null;
+      this.cdp = null;
     }
   }
 
@@ -0,0 +1,173 @@
+// Timing helpers for MotionText scenarios
+
+export interface CueTiming {
+  start: number;
+  end: number;
+}
+
+// Get the time window in which a cue can be visible
+export function getCueTiming(cue: any): CueTiming | null {
+  let start = Infinity;
+  let end = -Infinity;
+
+  const hintTime = cue?.hintTime;
+  if (hintTime && typeof hintTime.start === 'number' && typeof hintTime.end === 'number') {
+    start = hintTime.start;
+    end = hintTime.end;
+  }
+
+  // Any node of the cue tree may be displayed outside the root's window
+  const nodes: any[] = cue?.root ? [cue.root] : [];
+  while (nodes.length > 0) {
+    const node = nodes.pop();
+    const displayTime = node?.displayTime;
+    if (Array.isArray(displayTime) && displayTime.length === 2 &&
+        typeof displayTime[0] === 'number' && typeof displayTime[1] === 'number') {
+      start = Math.min(start, displayTime[0]);
+      end = Math.max(end, displayTime[1]);
+    }
+    if (Array.isArray(node?.children)) {
+      nodes.push(...node.children);
+    }
+  }
+
+  return end >= start ? { start, end } : null;
+}
+
+// Cue timings indexed for fast time lookups
+export interface CueIndex {
+  // Merged coverage: sorted, disjoint spans in which some cue is visible
+  starts: Float64Array;
+  ends: Float64Array;
+  duration: number;
+  // Individual cues sorted by start time (order = position in scenario.cues)
+  cueStarts: Float64Array;
+  cueEnds: Float64Array;
+  cueMaxEnds: Float64Array; // Running max of cueEnds
+  cueOrder: Uint32Array;
+}
+
+// First index whose value is greater than the given value (sorted array)
+function upperBound(values: Float64Array, value: number): number {
+  let low = 0;
+  let high = values.length;
+  while (low < high) {
+    const mid = (low + high) >>> 1;
+    if (values[mid] <= value) {
+      low = mid + 1;
+    } else {
+      high = mid;
+    }
+  }
+  return low;
+}
+
+// First index whose value is at least the given value (sorted array)
+function lowerBound(values: Float64Array, value: number): number {
+  let low = 0;
+  let high = values.length;
+  while (low < high) {
+    const mid = (low + high) >>> 1;
+    if (values[mid] < value) {
+      low = mid + 1;
+    } else {
+      high = mid;
+    }
+  }
+  return low;
+}
+
+// Build the cue index for a scenario (null if any cue has no timing)
+export function buildCueIndex(scenario: any): CueIndex | null {
+  const cues: any[] = scenario?.cues || [];
+  const timings: Array<CueTiming & { order: number }> = [];
+
+  for (let i = 0; i < cues.length; i++) {
+    const timing = getCueTiming(cues[i]);
+    if (!timing) {
+      return null;
+    }
+    timings.push({ start: timing.start, end: timing.end, order: i });
+  }
+
+  // Sweep over cues by start time, merging overlapping windows
+  timings.sort((a, b) => a.start - b.start);
+
+  const cueStarts = new Float64Array(timings.length);
+  const cueEnds = new Float64Array(timings.length);
+  const cueMaxEnds = new Float64Array(timings.length);
+  const cueOrder = new Uint32Array(timings.length);
+
+  const starts: number[] = [];
+  const ends: number[] = [];
+  let maxEnd = -Infinity;
+
+  for (let i = 0; i < timings.length; i++) {
+    const { start, end, order } = timings[i];
+    maxEnd = Math.max(maxEnd, end);
+    cueStarts[i] = start;
+    cueEnds[i] = end;
+    cueMaxEnds[i] = maxEnd;
+    cueOrder[i] = order;
+
+    const last = ends.length - 1;
+    if (last >= 0 && start <= ends[last]) {
+      ends[last] = Math.max(ends[last], end);
+    } else {
+      starts.push(start);
+      ends.push(end);
+    }
+  }
+
+  return {
+    starts: Float64Array.from(starts),
+    ends: Float64Array.from(ends),
+    duration: ends.length > 0 ? ends[ends.length - 1] : 0,
+    cueStarts,
+    cueEnds,
+    cueMaxEnds,
+    cueOrder
+  };
+}
+
+// Check whether any cue is visible at the given time
+export function hasActiveCue(index: CueIndex, time: number): boolean {
+  // Only the last span starting at or before the time can contain it
+  const span = upperBound(index.starts, time) - 1;
+  return span >= 0 && index.ends[span] >= time;
+}
+
+// Scenario with only the cues that can be visible between startTime and
+// endTime (the full scenario without an index; no cues if none overlap)
+export function sliceScenario(
+  scenario: any,
+  index: CueIndex | null,
+  startTime: number,
+  endTime: number
+): any {
+  if (!index) {
+    return scenario;
+  }
+
+  const { cueStarts, cueEnds, cueMaxEnds, cueOrder } = index;
+
+  // Candidates: from the first cue that (with those before it) reaches the
+  // chunk start, up to the last cue starting before the chunk ends
+  const first = lowerBound(cueMaxEnds, startTime);
+  const last = upperBound(cueStarts, endTime);
+
+  const order: number[] = [];
+  for (let i = first; i < last; i++) {
+    if (cueEnds[i] >= startTime) {
+      order.push(cueOrder[i]);
+    }
+  }
+
+  if (order.length === 0) {
+    return { ...scenario, cues: [] };
+  }
+
+  // Keep the scenario's own cue order
+  order.sort((a, b) => a - b);
+  return { ...scenario, cues: order.map(i => scenario.cues[i]) };
+}
@@ -1,8 +1,28 @@
 import { Router } from 'express';
 import Redis from 'ioredis';
+import { logger } from '../../utils/logger';
 
 export const healthRouter = Router();
 
+// Shared connection for health checks (connects on first use)
+let redis: Redis | null = null;
+
+function getRedis(): Redis {
+  if (!redis) {
+    redis = new Redis({
+      host: process.env.REDIS_HOST || 'localhost',
+      port: parseInt(process.env.REDIS_PORT || '6379'),
+      password: process.env.REDIS_PASSWORD,
+      lazyConnect: true,
+      maxRetriesPerRequest: 1 // Fail the probe fast while Redis is down
+    });
+    redis.on('error', (error) => {
+      logger.debug('Health check Redis error:', error);
+    });
+  }
+  return redis;
+}
+
 healthRouter.get('/', async (_req, res) => {
   const health = {
     status: 'healthy',
@@ -14,17 +34,11 @@ healthRouter.get('/', async (_req, res) => {
 
   // Check Redis connection
   try {
-    const redis = new Redis({
-      host: process.env.REDIS_HOST || 'localhost',
-      port: parseInt(process.env.REDIS_PORT || '6379'),
-      password: process.env.REDIS_PASSWORD
-    });
-    await redis.ping();
+    await getRedis().ping();
     health.redis = 'connected';
-    redis.disconnect();
   } catch (error) {
     health.redis = 'disconnected';
   }
 
   res.json(health);
-});
\ No newline at end of file
+});
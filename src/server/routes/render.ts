@@ -28,38 +28,51 @@ interface RenderRequest {
   };
 }
 
+// Job options shared by all render jobs
+const JOB_OPTIONS = {
+  removeOnComplete: false,
+  removeOnFail: false
+};
+
+// Build queued job data from a render request (with default options)
+function buildJobData(request: RenderRequest) {
+  const { scenario, sourceVideoUrl, options = {} } = request;
+
+  return {
+    jobId: uuidv4(),
+    scenario,
+    sourceVideoUrl,
+    resolution: options.resolution || { width: 1920, height: 1080 },
+    fps: options.fps || 30,
+    chunkSize: options.chunkSize || 10,
+    format: options.format || 'mp4'
+  };
+}
+
+// Check required fields of a render request
+function isValidRequest(request: RenderRequest | undefined): boolean {
+  return !!(request && request.scenario && request.sourceVideoUrl);
+}
+
 // Export video with overlay
 renderRouter.post('/export', async (req, res) => {
   try {
-    const { scenario, sourceVideoUrl, options = {} } = req.body as RenderRequest;
+    const request = req.body as RenderRequest;
 
     // Validate request
-    if (!scenario || !sourceVideoUrl) {
+    if (!isValidRequest(request)) {
       return res.status(400).json({
         error: 'Missing required fields: scenario and sourceVideoUrl'
       });
     }
 
-    // Generate job ID
-    const jobId = uuidv4();
-
-    // Default options
-    const jobData = {
-      jobId,
-      scenario,
-      sourceVideoUrl,
-      resolution: options.resolution || { width: 1920, height: 1080 },
-      fps: options.fps || 30,
-      chunkSize: options.chunkSize || 10,
-      format: options.format || 'mp4',
-      createdAt: new Date().toISOString()
-    };
+    const jobData = buildJobData(request);
+    const { jobId } = jobData;
 
     // Add job to queue
     await renderQueue.add('render-overlay', jobData, {
       jobId,
-      removeOnComplete: false,
-      removeOnFail: false
+      ...JOB_OPTIONS
     });
 
     logger.info(`Job ${jobId} added to queue`, { jobId });
@@ -79,33 +92,99 @@ renderRouter.post('/export', async (req, res) => {
   }
 });
 
+// Export multiple videos in one queue round trip
+renderRouter.post('/export/batch', async (req, res) => {
+  try {
+    const { jobs } = req.body as { jobs?: RenderRequest[] };
+
+    // Validate request
+    if (!Array.isArray(jobs) || jobs.length === 0) {
+      return res.status(400).json({
+        error: 'Missing required field: jobs'
+      });
+    }
+
+    if (!jobs.every(isValidRequest)) {
+      return res.status(400).json({
+        error: 'Missing required fields: scenario and sourceVideoUrl'
+      });
+    }
+
+    const jobsData = jobs.map(buildJobData);
+
+    // Add all jobs to queue at once
+    await renderQueue.addBulk(jobsData.map(jobData => ({
+      name: 'render-overlay',
+      data: jobData,
+      opts: {
+        jobId: jobData.jobId,
+        ...JOB_OPTIONS
+      }
+    })));
+
+    const jobIds = jobsData.map(jobData => jobData.jobId);
+    logger.info(`${jobIds.length} jobs added to queue`, { jobIds });
+
+    return res.json({
+      jobIds,
+      status: 'queued',
+      message: `${jobIds.length} jobs added to render queue`
+    });
+
+  } catch (error) {
+    logger.error('Error creating render jobs:', error);
+    return res.status(500).json({
+      error: 'Failed to create render jobs',
+      message: error instanceof Error ? error.message : 'Unknown error'
+    });
+  }
+});
+
+// Job hash fields needed to report status
+const STATUS_FIELDS = ['progress', 'returnvalue', 'failedReason', 'timestamp', 'processedOn', 'finishedOn'];
+
+// Parse a JSON-encoded job hash field
+function parseJobField(value: string | null): any {
+  if (value === null) {
+    return undefined;
+  }
+  try {
+    return JSON.parse(value);
+  } catch {
+    return value;
+  }
+}
+
 // Get job status
 renderRouter.get('/status/:jobId', async (req, res) => {
   try {
     const { jobId } = req.params;
 
-    const job = await renderQueue.getJob(jobId);
-
-    if (!job) {
+    // Read only the status fields; loading the whole job would also
+    // deserialize the (potentially large) scenario payload
+    // Both reads are sent together on the same connection (one round trip)
+    const client = await renderQueue.client;
+    const [fields, state] = await Promise.all([
+      client.hmget(renderQueue.toKey(jobId), ...STATUS_FIELDS),
+      renderQueue.getJobState(jobId)
+    ]);
+    const [progress, returnvalue, failedReason, timestamp, processedOn, finishedOn] = fields;
+
+    if (!timestamp) {
       return res.status(404).json({
         error: 'Job not found'
       });
     }
 
-    const state = await job.getState();
-    const progress = job.progress;
-    const result = job.returnvalue;
-    const failedReason = job.failedReason;
-
     return res.json({
       jobId,
       state,
-      progress,
-      result,
-      failedReason,
-      createdAt: job.timestamp,
-      processedAt: job.processedOn,
-      finishedAt: job.finishedOn
+      progress: parseJobField(progress) ?? 0,
+      result: parseJobField(returnvalue) ?? null,
+      failedReason: failedReason ?? undefined,
+      createdAt: parseInt(timestamp),
+      processedAt: processedOn ? parseInt(processedOn) : undefined,
+      finishedAt: finishedOn ? parseInt(finishedOn) : undefined
     });
 
   } catch (error) {
@@ -122,16 +201,24 @@ renderRouter.delete('/job/:jobId', async (req, res) => {
   try {
     const { jobId } = req.params;
 
-    const job = await renderQueue.getJob(jobId);
+    // Remove in one script call; only look up the state if it was refused
+    const removed = await renderQueue.remove(jobId);
 
-    if (!job) {
-      return res.status(404).json({
-        error: 'Job not found'
+    if (!removed) {
+      const state = await renderQueue.getJobState(jobId);
+
+      if (state === 'unknown') {
+        return res.status(404).json({
+          error: 'Job not found'
+        });
+      }
+
+      return res.status(409).json({
+        error: 'Job cannot be cancelled',
+        state
       });
     }
 
-    await job.remove();
-
     return res.json({
       jobId,
       status: 'cancelled',
@@ -1,12 +1,28 @@
-import { S3Client, PutObjectCommand, GetObjectCommand } from '@aws-sdk/client-s3';
+import {
+  S3Client,
+  PutObjectCommand,
+  GetObjectCommand,
+  HeadObjectCommand,
+  DeleteObjectCommand
+} from '@aws-sdk/client-s3';
 import { Upload } from '@aws-sdk/lib-storage';
 import { getSignedUrl } from '@aws-sdk/s3-request-presigner';
 import { logger } from '../utils/logger';
 import fs from 'fs';
 import { createReadStream, createWriteStream } from 'fs';
 import { pipeline } from 'stream/promises';
+import { Readable } from 'stream';
 import path from 'path';
 
+// Objects at least this large are downloaded as parallel byte ranges
+const RANGED_DOWNLOAD_THRESHOLD = 64 * 1024 * 1024;
+const DOWNLOAD_PART_SIZE = 16 * 1024 * 1024;
+const DOWNLOAD_CONCURRENCY = 4;
+
+// Multipart upload tuning (lib-storage defaults are 5 MiB parts, 4 at a time)
+const UPLOAD_PART_SIZE = 16 * 1024 * 1024;
+const UPLOAD_QUEUE_SIZE = 8;
+
 export class S3Service {
   private client: S3Client;
   private bucketName: string;
@@ -47,67 +63,200 @@ export class S3Service {
     }
   }
 
-  // Download video from S3
-  async downloadVideo(s3Url: string, jobId: string): Promise<string> {
+  // Download video from S3 (the signal cancels the download)
+  async downloadVideo(s3Url: string, jobId: string, signal?: AbortSignal): Promise<string> {
+    const localPath = path.join('/tmp', `${jobId}_source.mp4`);
+
     try {
       const { bucket, key } = this.parseS3Url(s3Url);
-      const localPath = path.join('/tmp', `${jobId}_source.mp4`);
 
       logger.info(`Downloading from S3: ${bucket}/${key}`);
 
-      const command = new GetObjectCommand({
+      const head = await this.client.send(new HeadObjectCommand({
         Bucket: bucket,
         Key: key
-      });
+      }), { abortSignal: signal });
+      const size = head.ContentLength || 0;
 
-      const response = await this.client.send(command);
+      if (size >= RANGED_DOWNLOAD_THRESHOLD) {
+        await this.downloadRanges(bucket, key, size, head.ETag, localPath, signal);
+      } else {
+        const command = new GetObjectCommand({
+          Bucket: bucket,
+          Key: key
+        });
 
-      if (!response.Body) {
-        throw new Error('No data received from S3');
-      }
+        const response = await this.client.send(command, { abortSignal: signal });
 
-      // Stream to local file
-      const writeStream = createWriteStream(localPath);
-      await pipeline(response.Body as any, writeStream);
+        if (!response.Body) {
+          throw new Error('No data received from S3');
+        }
+
+        // Stream to local file
+        const writeStream = createWriteStream(localPath);
+        await pipeline(response.Body as any, writeStream, { signal });
+      }
 
       logger.info(`Downloaded to: ${localPath}`);
       return localPath;
 
     } catch (error) {
-      logger.error('Failed to download from S3:', error);
+      if (signal?.aborted) {
+        logger.debug(`Download cancelled: ${s3Url}`);
+      } else {
+        logger.error('Failed to download from S3:', error);
+      }
+      // Don't leave a partial (or pre-sized) file behind
+      await fs.promises.unlink(localPath).catch(() => {});
       throw error;
     }
   }
 
-  // Upload video to S3
-  async uploadVideo(localPath: string, jobId: string): Promise<string> {
-    try {
-      const key = `renders/${jobId}/final_${Date.now()}.mp4`;
-      const fileStream = createReadStream(localPath);
-      const fileStats = await fs.promises.stat(localPath);
+  // Download an object as parallel byte ranges written at their file offsets
+  private async downloadRanges(
+    bucket: string,
+    key: string,
+    size: number,
+    etag: string | undefined,
+    localPath: string,
+    signal?: AbortSignal
+  ): Promise<void> {
+    const partCount = Math.ceil(size / DOWNLOAD_PART_SIZE);
+    const file = await fs.promises.open(localPath, 'w');
+    const controller = new AbortController();
+    let failure: unknown = null;
+    let next = 0;
+
+    // Stop every range when the caller cancels the download
+    const cancel = () => {
+      if (!controller.signal.aborted) {
+        failure = signal?.reason;
+        controller.abort();
+      }
+    };
+    signal?.addEventListener('abort', cancel, { once: true });
 
-      logger.info(`Uploading to S3: ${this.bucketName}/${key}`);
+    const runNext = async (): Promise<void> => {
+      while (next < partCount && !controller.signal.aborted) {
+        const start = (next++) * DOWNLOAD_PART_SIZE;
+        const end = Math.min(start + DOWNLOAD_PART_SIZE, size) - 1;
 
-      const upload = new Upload({
-        client: this.client,
-        params: {
-          Bucket: this.bucketName,
+        const response = await this.client.send(new GetObjectCommand({
+          Bucket: bucket,
           Key: key,
-          Body: fileStream,
-          ContentType: 'video/mp4',
-          ContentLength: fileStats.size
+          Range: `bytes=${start}-${end}`,
+          IfMatch: etag // Fail rather than mix parts of two object versions
+        }), { abortSignal: controller.signal });
+
+        if (!response.Body) {
+          throw new Error('No data received from S3');
         }
-      });
 
-      // Track upload progress
-      upload.on('httpUploadProgress', (progress) => {
-        if (progress.total) {
-          const percentage = ((progress.loaded || 0) / progress.total) * 100;
-          logger.debug(`Upload progress: ${percentage.toFixed(2)}%`);
+        const body = response.Body as Readable;
+        let offset = start;
+        for await (const chunk of body) {
+          // Another range failed; stop reading this one
+          if (controller.signal.aborted) {
+            body.destroy();
+            return;
+          }
+          await file.write(chunk, 0, chunk.length, offset);
+          offset += chunk.length;
         }
+      }
+    };
+
+    try {
+      signal?.throwIfAborted();
+      await file.truncate(size);
+      const runners = Array.from({ length: Math.min(DOWNLOAD_CONCURRENCY, partCount) }, () =>
+        runNext().catch((error) => {
+          // Cancel the other ranges; the first error is the one reported
+          if (!controller.signal.aborted) {
+            failure = error;
+            controller.abort();
+          }
+        })
+      );
+
+      // Every runner must stop writing before the file is closed
+      await Promise.all(runners);
+      if (controller.signal.aborted) {
+        throw failure;
+      }
+    } finally {
+      signal?.removeEventListener('abort', cancel);
+      await file.close();
+    }
+
+    logger.debug(`Downloaded ${partCount} ranges of ${key}`);
+  }
+
+  // Upload video to S3
+  async uploadVideo(localPath: string, jobId: string): Promise<string> {
+    const fileName = `final_${Date.now()}.mp4`;
+    const key = `renders/${jobId}/${fileName}`;
+
+    if (process.env.S3_DOUBLEWRITE_ENABLED !== 'true') {
+      return this.uploadFile(localPath, key, 'video/mp4');
+    }
+
+    // Write to two keys and keep whichever upload finishes first
+    // (trades a second PUT for lower tail latency)
+    const keys = [key, `renders-b/${jobId}/${fileName}`];
+    const streams = keys.map(() => createReadStream(localPath));
+
+    try {
+      const fileStats = await fs.promises.stat(localPath);
+
+      logger.info(`Uploading to S3 (double write): ${this.bucketName}/${key}`);
+
+      const uploads = keys.map((uploadKey, i) =>
+        this.createUpload(streams[i], uploadKey, 'video/mp4', fileStats.size)
+      );
+      const results = uploads.map(upload => upload.done());
+      const winner = await Promise.any(results.map((result, i) => result.then(() => i)));
+      const loser = 1 - winner;
+
+      // Stop the slower upload (aborting also cleans up its multipart parts).
+      // A PUT or CompleteMultipartUpload already sent may still land after
+      // the abort, so always delete its key once it settles.
+      await uploads[loser].abort();
+      await results[loser].catch(() => {
+        // Aborted or failed; the object may exist either way
       });
+      await this.client.send(new DeleteObjectCommand({
+        Bucket: this.bucketName,
+        Key: keys[loser]
+      })).catch((error) => {
+        logger.warn(`Failed to delete slower upload ${keys[loser]}:`, error);
+      });
+      logger.debug(`Dropped slower upload ${keys[loser]}`);
+
+      const url = await this.getFileUrl(keys[winner]);
+
+      logger.info(`Uploaded successfully: ${url}`);
+      return url;
+
+    } catch (error) {
+      const cause = error instanceof AggregateError ? error.errors[0] : error;
+      logger.error('Failed to upload to S3:', cause);
+      throw cause;
+
+    } finally {
+      streams.forEach(stream => stream.destroy());
+    }
+  }
+
+  // Upload local file to S3
+  async uploadFile(localPath: string, key: string, contentType: string): Promise<string> {
+    try {
+      const fileStream = createReadStream(localPath);
+      const fileStats = await fs.promises.stat(localPath);
+
+      logger.info(`Uploading to S3: ${this.bucketName}/${key}`);
 
-      await upload.done();
+      await this.createUpload(fileStream, key, contentType, fileStats.size).done();
 
       // Generate public URL or signed URL
       const url = await this.getFileUrl(key);
@@ -121,6 +270,32 @@ export class S3Service {
     }
   }
 
+  // Create a (multipart) upload of a stream to the bucket
+  private createUpload(body: Readable, key: string, contentType: string, size: number): Upload {
+    const upload = new Upload({
+      client: this.client,
+      partSize: UPLOAD_PART_SIZE,
+      queueSize: UPLOAD_QUEUE_SIZE,
+      params: {
+        Bucket: this.bucketName,
+        Key: key,
+        Body: body,
+        ContentType: contentType,
+        ContentLength: size
+      }
+    });
+
+    // Track upload progress
+    upload.on('httpUploadProgress', (progress) => {
+      if (progress.total) {
+        const percentage = ((progress.loaded || 0) / progress.total) * 100;
+        logger.debug(`Upload progress: ${percentage.toFixed(2)}%`);
+      }
+    });
+
+    return upload;
+  }
+
   // Get file URL (public or presigned)
   async getFileUrl(key: string, expiresIn: number = 3600): Promise<string> {
     try {
@@ -190,10 +365,10 @@ export class S3Service {
     }
   }
 
-  // Check if file exists
+  // Check if file exists (HEAD only, no object body is fetched)
   async fileExists(key: string): Promise<boolean> {
     try {
-      const command = new GetObjectCommand({
+      const command = new HeadObjectCommand({
         Bucket: this.bucketName,
         Key: key
       });
@@ -202,7 +377,7 @@ export class S3Service {
       return true;
 
     } catch (error: any) {
-      if (error.name === 'NoSuchKey') {
+      if (error.name === 'NotFound' || error.name === 'NoSuchKey') {
         return false;
       }
       throw error;
@@ -212,7 +387,7 @@ export class S3Service {
   // Delete file
   async deleteFile(key: string): Promise<void> {
     try {
-      const command = new GetObjectCommand({
+      const command = new DeleteObjectCommand({
         Bucket: this.bucketName,
         Key: key
       });
@@ -225,4 +400,4 @@ export class S3Service {
       throw error;
     }
   }
-}
\ No newline at end of file
+}
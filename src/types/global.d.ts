@@ -4,7 +4,7 @@ declare global {
   interface Window {
     pageReady?: boolean;
     loadMotionTextScenario?: (scenario: any) => Promise<{ success: boolean; error?: string; cueCount?: number }>;
-    seekToTime?: (time: number) => Promise<void>;
+    seekToTime?: (time: number) => Promise<{ success: boolean; error?: string; currentTime?: number; blank?: boolean }>;
     cleanup?: () => void;
     getRendererStatus?: () => any;
   }
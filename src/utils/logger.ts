@@ -4,10 +4,8 @@ import fs from 'fs';
 
 const logDir = process.env.LOG_DIR || './logs';
 
-// Create log directory if it doesn't exist
-if (!fs.existsSync(logDir)) {
-  fs.mkdirSync(logDir, { recursive: true });
-}
+// Create log directory if it doesn't exist (recursive mkdir is a no-op then)
+fs.mkdirSync(logDir, { recursive: true });
 
 // Define log format
 const logFormat = winston.format.combine(
@@ -0,0 +1,38 @@
+import fs from 'fs';
+import { logger } from './logger';
+
+// RAM-backed directory for short-lived intermediate files
+const SHM_DIR = '/dev/shm';
+
+// Only use /dev/shm if it has room for a job's intermediates
+// (Docker's default /dev/shm is 64MB, far too small)
+const MIN_SHM_FREE_BYTES = 2 * 1024 * 1024 * 1024;
+
+let scratchDir: string | null = null;
+
+function resolveScratchDir(): string {
+  if (process.env.SCRATCH_DIR) {
+    return process.env.SCRATCH_DIR;
+  }
+
+  try {
+    const stats = fs.statfsSync(SHM_DIR);
+    if (stats.bavail * stats.bsize >= MIN_SHM_FREE_BYTES) {
+      return SHM_DIR;
+    }
+  } catch (error) {
+    // No /dev/shm on this platform
+  }
+
+  return '/tmp';
+}
+
+// Directory for intermediate files (chunk overlays, concat lists).
+// Resolved on first use, after .env has been loaded.
+export function getScratchDir(): string {
+  if (!scratchDir) {
+    scratchDir = resolveScratchDir();
+    logger.info(`Using scratch directory: ${scratchDir}`);
+  }
+  return scratchDir;
+}